@@ -1,6 +1,77 @@
-from fuzzywuzzy import fuzz
+from rapidfuzz import fuzz, process
+import ahocorasick
+import functools
+import numpy as np
 import re
 
+_DATE_RE = re.compile(r"\d{1,2}[./-]\d{1,2}[./-]\d{2,4}")
+_CARD_RE = re.compile(r"[A-Z]?\s?\d{6,}\Z")
+
+# Define known label strings for fuzzy matching
+LABELS = {
+    "CHIEF": ["CHIEF", "CHIES", "CHEIF", "CHEF","CHILS"],
+    "DISTRICT": ["DISTRICT", "DISTNICT", "DIST", "DISRICT"],
+    "VILLAGE": ["VILLAGE", "VILLG", "VILAGE", "VILL"],
+    "SEX": ["SEX", "SAX", "S3X"],
+    "REGISTRATION DATE": ["REGISTRATIONDATE", "REGISTRATIOWDATE", "REGDATE"],
+    "DATE OF BIRTH": ["DATEOFBIRTH", "BIRTHDATE", "DOB"],
+    "CARD NUMBER": ["CARDNO", "CARDNUMBER"],
+    "MALE": ["MALE"],
+    "FEMALE": ["FEMALE"],
+    "NIL": ["NIL"],
+}
+
+# Printed text on the back of the card that shares Q3 with the village/chief values.
+# These are exact words rather than OCR-mangled labels, so they are matched as
+# substrings in one Aho-Corasick pass instead of fuzzily.
+Q3_NOISE = ["MARKS", "SPECIAL", "IF", "THIS", "CARD", "IS", "FOUND", "PLEASE", "OR"]
+
+Q3_NOISE_AUTOMATON = ahocorasick.Automaton()
+for _word in Q3_NOISE:
+    Q3_NOISE_AUTOMATON.add_word(_word, _word)
+Q3_NOISE_AUTOMATON.make_automaton()
+
+def is_q3_noise(text):
+    # A stopword inside the text, or the text being a fragment of one ("PLEAS", "CAR")
+    if any(True for _ in Q3_NOISE_AUTOMATON.iter(text)):
+        return True
+    return bool(text) and any(text in word for word in Q3_NOISE)
+
+# English-like terms in Q2 that are never part of the first name
+IGNORE = [
+    "REPUBLIC", "OF", "NATIONAL", "REGISTRATION", "FULLNAME", "FULL NAME",
+    "DATE", "BIRTH", "PLACE", "FATHER", "MOTHER", "SEX"
+]
+
+# Flat table of every label scored per image. CHIEF and VILLAGE are adjacent
+# because they are also checked together.
+LABEL_TABLE = LABELS["CHIEF"] + LABELS["VILLAGE"] + LABELS["DISTRICT"] + IGNORE
+
+_chief_end = len(LABELS["CHIEF"])
+_village_end = _chief_end + len(LABELS["VILLAGE"])
+_district_end = _village_end + len(LABELS["DISTRICT"])
+
+CHIEF_SLICE = slice(0, _chief_end)
+CHIEF_VILLAGE_SLICE = slice(0, _village_end)
+DISTRICT_SLICE = slice(_village_end, _district_end)
+IGNORE_SLICE = slice(_district_end, len(LABEL_TABLE))
+
+@functools.lru_cache(maxsize=8192)
+def _sim(text, label_key, scorer=fuzz.partial_ratio):
+    """Best score of text against a LABELS group. Cached per process, so common
+    tokens like MALE or NIL are only scored once across a whole batch."""
+    return max(scorer(text, label) for label in LABELS[label_key])
+
+def is_similar(word, label_key, scorer=fuzz.partial_ratio):
+    # An exact substring always scores 100 with partial_ratio, so skip the scorer
+    if word and scorer is fuzz.partial_ratio:
+        if any(label in word or word in label for label in LABELS[label_key]):
+            return True
+    return _sim(word, label_key, scorer) >= 80
+
+# Quadrant number (1-4 for Q1-Q4) indexed by (x > x_center) * 2 + (y > y_center)
+QUADRANT_CODES = np.array([2, 3, 1, 4])
+
 def extract_all_fields(ocr_result, image):
     image_path = ocr_result['input_path']
     if image is None:
@@ -9,44 +80,21 @@ def extract_all_fields(ocr_result, image):
     height, width = image.shape[:2]
     x_center, y_center = width // 2, height // 2
 
-    def classify_point(x, y):
-        if x > x_center and y < y_center:
-            return 'Q1'
-        elif x < x_center and y < y_center:
-            return 'Q2'
-        elif x < x_center and y > y_center:
-            return 'Q3'
-        elif x > x_center and y > y_center:
-            return 'Q4'
-        return 'Mixed'
-
-    # Define known label strings for fuzzy matching
-    LABELS = {
-        "CHIEF": ["CHIEF", "CHIES", "CHEIF", "CHEF","CHILS"],
-        "DISTRICT": ["DISTRICT", "DISTNICT", "DIST", "DISRICT"],
-        "VILLAGE": ["VILLAGE", "VILLG", "VILAGE", "VILL"],
-        "SEX": ["SEX", "SAX", "S3X"],
-        "REGISTRATION DATE": ["REGISTRATIONDATE", "REGISTRATIOWDATE", "REGDATE"],
-        "DATE OF BIRTH": ["DATEOFBIRTH", "BIRTHDATE", "DOB"],
-        "CARD NUMBER": ["CARDNO", "CARDNUMBER"],
-    }
-
-    def is_similar(word, label_group):
-        return any(fuzz.partial_ratio(word.upper(), l.upper()) > 80 for l in label_group)
-
     rec_texts = ocr_result['rec_texts']
     rec_polys = ocr_result['dt_polys']
 
-    # Annotate texts with quadrants and centers
-    items = []
-    for text, poly in zip(rec_texts, rec_polys):
-        avg_x = sum(x for x, y in poly) / len(poly)
-        avg_y = sum(y for x, y in poly) / len(poly)
-        quadrant = classify_point(avg_x, avg_y)
-        items.append({'text': text.strip().upper(), 'x': avg_x, 'y': avg_y, 'quadrant': quadrant})
+    # Annotate texts with quadrants and centers, one array per attribute
+    polys = np.asarray(rec_polys, dtype=np.float32)
+    centers = polys.mean(axis=1) if len(polys) else np.empty((0, 2), dtype=np.float32)
+    cx, cy = centers[:, 0], centers[:, 1]
+    quads = QUADRANT_CODES[(cx > x_center).astype(int) * 2 + (cy > y_center)]
+    quads[(cx == x_center) | (cy == y_center)] = 0  # Centers on an axis belong to no quadrant
+    texts = [text.strip().upper() for text in rec_texts]
 
     # Sort items top to bottom, left to right
-    items.sort(key=lambda i: (i['y'], i['x']))
+    order = np.lexsort((cx, cy))
+    texts = [texts[n] for n in order]
+    quads, cx, cy = quads[order], cx[order], cy[order]
 
     # Step-by-step parsing state
     dob = None
@@ -58,91 +106,97 @@ def extract_all_fields(ocr_result, image):
     chief = None
     first_name = None
 
-    q1_items = [i for i in items if i['quadrant'] == 'Q1']
-    q2_items = [i for i in items if i['quadrant'] == 'Q2']
-    q3_items = [i for i in items if i['quadrant'] == 'Q3']
-    q4_items = [i for i in items if i['quadrant'] == 'Q4']
+    # Score every text against every label in a single cdist call; rows follow the sorted items
+    scores = process.cdist(texts, LABEL_TABLE, scorer=fuzz.partial_ratio, dtype=np.uint8, score_cutoff=80)
+    # Label checks keep the strict > 80 of the original is_similar; uint8 scores
+    # are rounded, so this matches its rounded integer comparison exactly
+    is_chief = scores[:, CHIEF_SLICE].max(axis=1) > 80
+    chief_village_scores = scores[:, CHIEF_VILLAGE_SLICE].max(axis=1)
+    is_chief_or_village = chief_village_scores > 80
+    is_q3_label = chief_village_scores >= 85
+    is_district = scores[:, DISTRICT_SLICE].max(axis=1) > 80
+    is_ignored = scores[:, IGNORE_SLICE].max(axis=1) >= 80
+
+    q1_idx = np.flatnonzero(quads == 1)
+    q2_idx = np.flatnonzero(quads == 2)
+    q3_idx = np.flatnonzero(quads == 3)
+    q4_idx = np.flatnonzero(quads == 4)
+
+    # Date pattern is matched once per text and shared by DOB and registration date
+    is_date = np.fromiter((_DATE_RE.match(t) is not None for t in texts), dtype=bool, count=len(texts))
 
     # Extract DOB (from Q2, match date pattern)
-    date_regex = re.compile(r"\d{1,2}[./-]\d{1,2}[./-]\d{2,4}")
-    for item in q2_items:
-        if date_regex.match(item['text']):
-            dob = item['text']
-            break
+    dob_mask = is_date & (quads == 2)
+    if dob_mask.any():
+        dob = texts[dob_mask.argmax()]
 
     # Extract Registration Date (from Q4)
-    for item in q4_items:
-        if date_regex.match(item['text']):
-            registration_date = item['text']
-            break
+    registration_mask = is_date & (quads == 4)
+    if registration_mask.any():
+        registration_date = texts[registration_mask.argmax()]
 
     # Extract Card Number (from Q1)
-    for item in q1_items:
-        if re.fullmatch(r"[A-Z]?\s?\d{6,}", item['text']):
-            card_number = item['text'].replace(" ", "")
-            if not card_number.upper().startswith("Z"):
+    for n in q1_idx:
+        if _CARD_RE.match(texts[n]):
+            card_number = texts[n].replace(" ", "")
+            if not card_number.startswith("Z"):
                 card_number = "Z" + card_number
             break
 
     # Extract Sex (Q1)
-    for item in q1_items:
-        t = item['text'].strip().rstrip(".") #OCR might add a '.', which can mess up the detection logic
-        if fuzz.partial_ratio(t, "MALE") >= 80:
+    for n in q1_idx:
+        t = texts[n].strip().rstrip(".") #OCR might add a '.', which can mess up the detection logic
+        if is_similar(t, "MALE"):
             sex = "Male"
             break
-        elif fuzz.partial_ratio(t, "FEMALE") >= 80:
+        elif is_similar(t, "FEMALE"):
             sex = "Female"
             break
 
 
     # Extract First Name (from Q2): exclude English-like terms
-    IGNORE = [
-        "REPUBLIC", "OF", "NATIONAL", "REGISTRATION", "FULLNAME", "FULL NAME",
-        "DATE", "BIRTH", "PLACE", "FATHER", "MOTHER", "SEX"
-    ]
-    candidate_names = [i['text'] for i in q2_items if all(fuzz.partial_ratio(i['text'], ign) < 80 for ign in IGNORE)]
-    if candidate_names:
-        first_name = candidate_names[0]
+    candidate_names = q2_idx[~is_ignored[q2_idx]]
+    if candidate_names.size:
+        first_name = texts[candidate_names[0]]
 
     # Extract village and chief (from Q3)
-    q3_words = [i for i in q3_items if all(fuzz.partial_ratio(i['text'], ign) < 85 for ign in (
-        LABELS['CHIEF'] + LABELS['VILLAGE'] + [
-            "MARKS", "SPECIAL", "IF", "THIS", "CARD", "IS", "FOUND", "PLEASE", "OR"
-        ]
-    ))]
+    has_noise_word = np.fromiter(
+        (is_q3_noise(texts[n]) for n in q3_idx),
+        dtype=bool, count=len(q3_idx)
+    )
+    q3_words = q3_idx[~is_q3_label[q3_idx] & ~has_noise_word]
 
-    if q3_words:
+    if q3_words.size:
         # Village is closest to y_center (x-axis)
-        village_candidate = min(q3_words, key=lambda i: abs(i['y'] - y_center))
-        village = village_candidate['text']
+        village = texts[q3_words[np.argmin(np.abs(cy[q3_words] - y_center))]]
         # Chief = other word(s)
-        other_chief = [i['text'] for i in q3_words if i['text'] != village]
+        other_chief = [texts[n] for n in q3_words if texts[n] != village]
         for word in other_chief:
-            if fuzz.ratio(word, "NIL") < 80:
+            if not is_similar(word, "NIL", fuzz.ratio):
                 chief = word
                 break
 
     # Extract district (Q4) via label
-    for idx, item in enumerate(q4_items[:-1]):
-        if is_similar(item['text'], LABELS["DISTRICT"]):
-            next_text = q4_items[idx + 1]['text']
+    for idx, n in enumerate(q4_idx[:-1]):
+        if is_district[n]:
+            next_text = texts[q4_idx[idx + 1]]
             if next_text and next_text.isalpha():
                 district = next_text
                 break
 
     # Fallback for district: pick any standalone word not labeled as CHIEF/VILLAGE/NIL
     if not district:
-        for item in q4_items:
-            if item['text'].isalpha() and fuzz.partial_ratio(item['text'], "NIL") < 80:
-                if not is_similar(item['text'], LABELS["CHIEF"] + LABELS["VILLAGE"]):
-                    district = item['text']
+        for n in q4_idx:
+            if texts[n].isalpha() and not is_similar(texts[n], "NIL"):
+                if not is_chief_or_village[n]:
+                    district = texts[n]
                     break
 
     # Extract chief (override with Q4 if CHIEF label found)
-    for idx, item in enumerate(q4_items[:-1]):
-        if is_similar(item['text'], LABELS["CHIEF"]):
-            next_text = q4_items[idx + 1]['text']
-            if next_text and fuzz.ratio(next_text, "NIL") < 80:
+    for idx, n in enumerate(q4_idx[:-1]):
+        if is_chief[n]:
+            next_text = texts[q4_idx[idx + 1]]
+            if next_text and not is_similar(next_text, "NIL", fuzz.ratio):
                 chief = next_text
                 break
 
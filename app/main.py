@@ -1,96 +1,136 @@
 import argparse
 import multiprocessing as mp
-from queue import Empty
+import os
+
+NUM_WORKERS = 2
+
+# OpenMP/MKL size their thread pools when numpy, cv2 and paddle load, and pool
+# workers inherit that through fork, so each worker's share of the cores has to
+# be set here before those imports rather than in initialize_ocr
+os.environ.setdefault('OMP_NUM_THREADS', str(max(1, mp.cpu_count() // NUM_WORKERS)))
+os.environ.setdefault('MKL_NUM_THREADS', str(max(1, mp.cpu_count() // NUM_WORKERS)))
+
 from pathlib import Path
 import cv2
 import numpy as np
+import paddle
 from paddleocr import PaddleOCR
 from PIL import Image
 import logging
-import json
+import orjson
 
 from extract_all_fields import extract_all_fields
 
-class OCRWorker(mp.Process):
-    def __init__(self, queue_in, queue_out, config):
-        super().__init__()
-        self.queue_in = queue_in
-        self.queue_out = queue_out
-        self.config = config
-        self.ocr_engine = None
-
-    def initialize_ocr(self):
-        self.ocr_engine = PaddleOCR(
-            lang='en',
-            cpu_threads=self.config['num_cpu_threads'],
-            device='cpu',
-            rec_batch_num=self.config['batch_size'],
-            use_textline_orientation=False,
-            text_detection_model_name="PP-OCRv3_mobile_det",
-            text_recognition_model_name="PP-OCRv3_mobile_rec",
-            use_doc_orientation_classify=False,
-            use_doc_unwarping=False
-        )
-
-    def process_image(self, image_path):
-        try:
-            img = cv2.imread(str(image_path))
-            raw_result = self.ocr_engine.predict(img)
-
-            processed_fields = extract_all_fields(raw_result[0], img) if raw_result else {}
+# Longest side images are scaled down to before OCR; the mobile models resize
+# internally anyway, so larger scans only cost extra copying
+MAX_IMAGE_SIDE = 1280
+
+# PaddleOCR engine owned by the current pool worker, set up by initialize_ocr
+_ENGINE = None
+
+def detect_device():
+    if paddle.is_compiled_with_cuda() and paddle.device.cuda.device_count() > 0:
+        return 'gpu'
+    return 'cpu'
+
+def initialize_ocr(config):
+    global _ENGINE
+    _ENGINE = PaddleOCR(
+        lang='en',
+        cpu_threads=config['num_cpu_threads'],
+        device=detect_device(),
+        rec_batch_num=config['batch_size'],
+        use_textline_orientation=False,
+        text_detection_model_name="PP-OCRv3_mobile_det",
+        text_recognition_model_name="PP-OCRv3_mobile_rec",
+        # Optional local exports (e.g. PaddleSlim INT8 builds) of the same architectures
+        text_detection_model_dir=config['det_model_dir'],
+        text_recognition_model_dir=config['rec_model_dir'],
+        use_doc_orientation_classify=False,
+        use_doc_unwarping=False
+    )
+    # Run one blank image through so first-inference setup happens before real work
+    _ENGINE.predict(np.zeros((640, 640, 3), dtype=np.uint8))
+
+def process_image(image_path, img, raw_result):
+    try:
+        processed_fields = extract_all_fields(raw_result, img)
+
+        # Only plain Python values go back to the parent process; the PaddleOCR
+        # result object and its numpy arrays stay in the worker
+        return {
+            'path': str(image_path),
+            'processed_fields': processed_fields,
+            'success': True,
+            'raw_texts': [str(text) for text in raw_result['rec_texts']]
+        }
 
-            return {
-                'path': str(image_path),
-                'processed_fields': processed_fields,
-                'success': True,
-                'raw_texts': raw_result[0]['rec_texts']
-            }
+    except Exception as e:
+        return {
+            'path': str(image_path),
+            'error': str(e),
+            'success': False
+        }
 
-        except Exception as e:
-            return {
+def load_image(image_path):
+    img = cv2.imread(str(image_path))
+    if img is not None:
+        height, width = img.shape[:2]
+        scale = MAX_IMAGE_SIDE / max(height, width)
+        if scale < 1:
+            img = cv2.resize(img, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    return img
+
+def process_batch(image_paths):
+    results = []
+    readable = []
+    for image_path in image_paths:
+        img = load_image(image_path)
+        if img is None:
+            results.append({
                 'path': str(image_path),
-                'error': str(e),
+                'error': f"Could not read image: {image_path}",
                 'success': False
-            }
-
-    def run(self):
-        self.initialize_ocr()
-        while True:
-            try:
-                item = self.queue_in.get(timeout=60)
-                if item is None:
-                    break
-                result = self.process_image(item)
-                self.queue_out.put(result)
-            except Empty:
-                continue
-            except Exception as e:
-                logging.error(f"Worker error: {str(e)}")
-                continue
+            })
+        else:
+            readable.append((image_path, img))
+
+    if not readable:
+        return results
+
+    try:
+        raw_results = _ENGINE.predict([img for _, img in readable])
+    except Exception as e:
+        return results + [
+            {'path': str(image_path), 'error': str(e), 'success': False}
+            for image_path, _ in readable
+        ]
+
+    for (image_path, img), raw_result in zip(readable, raw_results):
+        results.append(process_image(image_path, img, raw_result))
+    return results
 
 class OCRProcessor:
-    def __init__(self, num_workers=2):
+    def __init__(self, num_workers=NUM_WORKERS, det_model_dir=None, rec_model_dir=None):
         self.num_workers = num_workers
         self.config = {
-            'num_cpu_threads': mp.cpu_count(),
+            'num_cpu_threads': max(1, mp.cpu_count() // num_workers),
             'batch_size': 2,
-            'queue_size': 200
+            'det_model_dir': det_model_dir,
+            'rec_model_dir': rec_model_dir
         }
-        self.work_queue = mp.Queue(maxsize=self.config['queue_size'])
-        self.result_queue = mp.Queue()
-        self.workers = []
+        self.pool = None
 
     def start_workers(self):
-        for _ in range(self.num_workers):
-            worker = OCRWorker(self.work_queue, self.result_queue, self.config)
-            worker.start()
-            self.workers.append(worker)
+        self.pool = mp.Pool(
+            self.num_workers,
+            initializer=initialize_ocr,
+            initargs=(self.config,)
+        )
 
     def stop_workers(self):
-        for _ in range(self.num_workers):
-            self.work_queue.put(None)
-        for worker in self.workers:
-            worker.join()
+        self.pool.close()
+        self.pool.join()
 
     def process_directory(self, input_path, output_path):
         input_path = Path(input_path)
@@ -99,31 +139,40 @@ class OCRProcessor:
 
         image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
         images = [p for p in input_path.rglob('*') if p.suffix.lower() in image_extensions]
+        # Largest files first so a big scan is never the last task holding up the pool
+        images.sort(key=lambda p: p.stat().st_size, reverse=True)
+        images = [str(p) for p in images]
 
-        for img_path in images:
-            self.work_queue.put(str(img_path))
+        # Each task is one predict() batch; results stream back as workers finish them
+        batch_size = self.config['batch_size']
+        batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
 
         total_images = len(images)
         processed = 0
-        results = {}
-
-        while processed < total_images:
-            try:
-                result = self.result_queue.get(timeout=60)
-                results[result['path']] = result
-
-                if result['success']:
-                    print(f"✅ {processed + 1}/{total_images}: {result['path']}")
-                else:
-                    print(f"❌ {result['path']}: {result['error']}")
-
-                processed += 1
-            except Empty:
-                continue
 
+        # Results are streamed into a JSON object keyed by path as they arrive, so
+        # memory stays flat however many images there are. The file is written
+        # under a temporary name and moved into place once complete, so the
+        # dashboard never sees a half-written file.
         output_file = output_path / "ocr_results.json"
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2, ensure_ascii=False, default=safe_json)
+        partial_file = output_path / "ocr_results.json.partial"
+        with open(partial_file, "wb") as f:
+            f.write(b"{")
+            for batch_results in self.pool.imap_unordered(process_batch, batches):
+                for result in batch_results:
+                    entry = orjson.dumps(result, default=safe_json, option=orjson.OPT_INDENT_2)
+                    if processed:
+                        f.write(b",")
+                    f.write(b"\n  " + orjson.dumps(result['path']) + b": " + entry.replace(b"\n", b"\n  "))
+
+                    if result['success']:
+                        print(f"✅ {processed + 1}/{total_images}: {result['path']}")
+                    else:
+                        print(f"❌ {result['path']}: {result['error']}")
+
+                    processed += 1
+            f.write(b"\n}" if processed else b"}")
+        partial_file.replace(output_file)
 
         print(f"\n📄 Results saved to: {output_file}")
 
@@ -142,6 +191,10 @@ def main():
     parser = argparse.ArgumentParser(description="Batch OCR using PaddleOCR")
     parser.add_argument('input_dir', type=str, help="Input directory with images")
     parser.add_argument('output_dir', type=str, help="Directory to save OCR results")
+    parser.add_argument('--det-model-dir', type=str, default=None,
+                        help="Local PP-OCRv3_mobile_det export to use, e.g. an INT8-quantized build")
+    parser.add_argument('--rec-model-dir', type=str, default=None,
+                        help="Local PP-OCRv3_mobile_rec export to use, e.g. an INT8-quantized build")
     args = parser.parse_args()
 
     input_path = Path(args.input_dir)
@@ -149,7 +202,11 @@ def main():
         print(f"❌ Invalid input directory: {input_path}")
         exit(1)
 
-    processor = OCRProcessor(num_workers=2)
+    processor = OCRProcessor(
+        num_workers=NUM_WORKERS,
+        det_model_dir=args.det_model_dir,
+        rec_model_dir=args.rec_model_dir
+    )
     processor.start_workers()
 
     try:
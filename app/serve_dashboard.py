@@ -1,8 +1,10 @@
-from fastapi import FastAPI, Request
+from fastapi import BackgroundTasks, FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
 import os
-import json
+import gzip
+import threading
+import orjson
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from datetime import datetime
@@ -19,6 +21,16 @@ API_KEY = "FGfEHRbtkWq7BHhb!8NJHHB9h9h78gK7Lasx0fEE*TknpHOZ"
 IMAGE_DIR = Path("./test_images")
 OCR_JSON_PATH = Path("./output/ocr_results.json")
 RESULTS_DIR = Path("./output/batch_results")
+JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+# Parsed OCR data and image listing, keyed by the mtime they were read at.
+# The cached OCR dict is shared by concurrent requests and must never be
+# mutated; writers build a new dict and swap it in after saving.
+_OCR_CACHE = {'mtime': None, 'data': None}
+_IMAGE_CACHE = {'mtime': None, 'images': None}
+
+# Serializes load-modify-save of ocr_results.json so concurrent submissions don't lose updates
+_OCR_WRITE_LOCK = threading.Lock()
 
 # Create results directory if it doesn't exist
 RESULTS_DIR.mkdir(parents=True, exist_ok=True)
@@ -49,33 +61,61 @@ class BatchSubmissionRequest(BaseModel):
     results: List[ImageResult]
 
 def load_ocr_data() -> Dict[str, Any]:
-    """Load OCR data from JSON file"""
+    """Load OCR data from JSON file, reusing the last parse while the file is unchanged"""
     try:
-        with open(OCR_JSON_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        mtime = OCR_JSON_PATH.stat().st_mtime_ns
+        if mtime == _OCR_CACHE['mtime']:
+            return _OCR_CACHE['data']
+        with open(OCR_JSON_PATH, 'rb') as f:
+            data = orjson.loads(f.read())
+        cache_ocr_data(mtime, data)
+        return data
     except FileNotFoundError:
         return {}
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         return {}
 
+def cache_ocr_data(mtime: int, data: Dict[str, Any]) -> None:
+    # Data goes in before its mtime, so a concurrent reader can never pair the
+    # new mtime with the old data
+    _OCR_CACHE['data'] = data
+    _OCR_CACHE['mtime'] = mtime
+
 def save_ocr_data(data: Dict[str, Any]) -> bool:
-    """Save OCR data to JSON file"""
+    """Save OCR data to JSON file and make it the cached copy"""
     try:
-        with open(OCR_JSON_PATH, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with open(OCR_JSON_PATH, 'wb') as f:
+            f.write(orjson.dumps(data, option=JSON_OPTIONS))
+        cache_ocr_data(OCR_JSON_PATH.stat().st_mtime_ns, data)
         return True
     except Exception as e:
         print(f"Error saving OCR data: {e}")
         return False
 
+def list_images() -> List[Path]:
+    """Sorted image files in IMAGE_DIR, rescanned only when the directory changes"""
+    mtime = IMAGE_DIR.stat().st_mtime_ns
+    if mtime != _IMAGE_CACHE['mtime']:
+        _IMAGE_CACHE['images'] = sorted([
+            file for file in IMAGE_DIR.iterdir()
+            if file.suffix.lower() in {'.jpg', '.jpeg', '.png'}
+        ])
+        _IMAGE_CACHE['mtime'] = mtime
+    return _IMAGE_CACHE['images']
+
+def write_batch_archive(path: Path, payload: bytes) -> None:
+    """Write a gzip-compressed copy of a batch results file"""
+    try:
+        with gzip.open(path, 'wb') as f:
+            f.write(payload)
+    except Exception as e:
+        print(f"Warning: Failed to save batch results file: {e}")
+
 # Utility to paginate images
 def get_image_batch(start: int, end: int) -> List[dict]:
     ocr_data = load_ocr_data()
 
-    images = sorted([
-        file for file in IMAGE_DIR.iterdir()
-        if file.suffix.lower() in {'.jpg', '.jpeg', '.png'}
-    ])
+    images = list_images()
 
     batch = []
     for img_path in images[start:end]:
@@ -145,111 +185,121 @@ def get_stats():
 
 
 @app.post("/api/batch/submit")
-def submit_batch_grades(request: BatchSubmissionRequest):
+def submit_batch_grades(request: BatchSubmissionRequest, background_tasks: BackgroundTasks):
     """
     Submit all grades and save them to the OCR results file and a timestamped batch results file
     """
     try:
-        # Load existing OCR data
-        ocr_data = load_ocr_data()
+        with _OCR_WRITE_LOCK:
+            # Work on a copy of the cached data; other requests may be reading it
+            ocr_data = dict(load_ocr_data())
+
+            # Map each image file name to its OCR key so lookups below are O(1)
+            name_index = {}
+            for key in ocr_data:
+                name_index.setdefault(key.rsplit("/", 1)[-1], key)
         
-        # Create a timestamp for this batch submission
-        timestamp = datetime.now().isoformat()
+            # Create a timestamp for this batch submission
+            timestamp = datetime.now().isoformat()
         
-        # Process each image result
-        updated_images = []
-        batch_results = {
-            "submission_timestamp": timestamp,
-            "total_images": len(request.results),
-            "results": []
-        }
+            # Process each image result
+            updated_images = []
+            batch_results = {
+                "submission_timestamp": timestamp,
+                "total_images": len(request.results),
+                "results": []
+            }
+            total_fields = total_correct = total_incorrect = 0
         
-        for image_result in request.results:
-            # Find the corresponding OCR entry
-            image_key = None
-            for key in ocr_data.keys():
-                if key.endswith(image_result.imageName):
-                    image_key = key
-                    break
+            for image_result in request.results:
+                # Find the corresponding OCR entry
+                image_key = name_index.get(image_result.imageName)
             
-            if not image_key:
-                # If not found, create a new entry
-                image_key = f"test_images/{image_result.imageName}"
-                ocr_data[image_key] = {"processed_fields": {}}
+                if not image_key:
+                    # If not found, create a new entry
+                    image_key = f"test_images/{image_result.imageName}"
+                    ocr_data[image_key] = {"processed_fields": {}}
+                    name_index[image_result.imageName] = image_key
             
-            # Update user ratings
-            user_ratings = {}
-            field_results = []
+                # Update user ratings and tally the field grades in a single pass
+                user_ratings = {}
+                field_results = []
+                graded = correct = incorrect = 0
             
-            for field in image_result.fields:
-                if field.status is not None:
-                    user_ratings[field.field] = {
-                        "is_correct": field.status,
-                        "timestamp": timestamp
-                    }
+                for field in image_result.fields:
+                    if field.status is not None:
+                        user_ratings[field.field] = {
+                            "is_correct": field.status,
+                            "timestamp": timestamp
+                        }
+                        graded += 1
+                        if field.status:
+                            correct += 1
+                        else:
+                            incorrect += 1
                     
-                field_results.append({
-                    "field": field.field,
-                    "predicted_value": field.value,
-                    "user_rating": field.status,
-                    "is_correct": field.status
-                })
+                    field_results.append({
+                        "field": field.field,
+                        "predicted_value": field.value,
+                        "user_rating": field.status,
+                        "is_correct": field.status
+                    })
             
-            # Update OCR data
-            ocr_data[image_key]["user_ratings"] = user_ratings
-            ocr_data[image_key]["graded_at"] = timestamp
-            ocr_data[image_key]["is_graded"] = True
+                # Update OCR data with a new entry rather than editing the shared one
+                ocr_data[image_key] = {
+                    **ocr_data[image_key],
+                    "user_ratings": user_ratings,
+                    "graded_at": timestamp,
+                    "is_graded": True
+                }
             
-            # Add to batch results
-            batch_results["results"].append({
-                "image_name": image_result.imageName,
-                "image_path": image_key,
-                "total_fields": len(image_result.fields),
-                "graded_fields": len([f for f in image_result.fields if f.status is not None]),
-                "correct_fields": len([f for f in image_result.fields if f.status is True]),
-                "incorrect_fields": len([f for f in image_result.fields if f.status is False]),
-                "accuracy": round(len([f for f in image_result.fields if f.status is True]) / max(len([f for f in image_result.fields if f.status is not None]), 1) * 100, 2),
-                "fields": field_results
-            })
+                # Add to batch results
+                batch_results["results"].append({
+                    "image_name": image_result.imageName,
+                    "image_path": image_key,
+                    "total_fields": len(image_result.fields),
+                    "graded_fields": graded,
+                    "correct_fields": correct,
+                    "incorrect_fields": incorrect,
+                    "accuracy": round(correct / max(graded, 1) * 100, 2),
+                    "fields": field_results
+                })
+                total_fields += len(field_results)
+                total_correct += correct
+                total_incorrect += incorrect
             
-            updated_images.append(image_result.imageName)
+                updated_images.append(image_result.imageName)
         
-        # Calculate overall batch statistics
-        total_fields = sum(len(result["fields"]) for result in batch_results["results"])
-        total_correct = sum(result["correct_fields"] for result in batch_results["results"])
-        overall_accuracy = round(total_correct / max(total_fields, 1) * 100, 2) if total_fields > 0 else 0
+            # Calculate overall batch statistics
+            overall_accuracy = round(total_correct / max(total_fields, 1) * 100, 2) if total_fields > 0 else 0
         
-        batch_results["summary"] = {
-            "total_fields_reviewed": total_fields,
-            "total_correct_fields": total_correct,
-            "total_incorrect_fields": sum(result["incorrect_fields"] for result in batch_results["results"]),
-            "overall_accuracy": overall_accuracy,
-            "images_processed": len(updated_images)
-        }
+            batch_results["summary"] = {
+                "total_fields_reviewed": total_fields,
+                "total_correct_fields": total_correct,
+                "total_incorrect_fields": total_incorrect,
+                "overall_accuracy": overall_accuracy,
+                "images_processed": len(updated_images)
+            }
         
-        # Save updated OCR data
-        if not save_ocr_data(ocr_data):
-            return JSONResponse(
-                content={"error": "Failed to save OCR data"}, 
-                status_code=500
-            )
+            # Save updated OCR data
+            if not save_ocr_data(ocr_data):
+                return JSONResponse(
+                    content={"error": "Failed to save OCR data"}, 
+                    status_code=500
+                )
         
-        # Save batch results to a timestamped file
-        batch_filename = f"batch_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        payload = orjson.dumps(batch_results, option=JSON_OPTIONS)
+
+        # Save batch results to a timestamped, gzipped file once the response is sent
+        batch_filename = f"batch_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json.gz"
         batch_file_path = RESULTS_DIR / batch_filename
-        
-        try:
-            with open(batch_file_path, 'w', encoding='utf-8') as f:
-                json.dump(batch_results, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Warning: Failed to save batch results file: {e}")
-            # Continue execution even if batch file save fails
+        background_tasks.add_task(write_batch_archive, batch_file_path, payload)
         
         # Also save/update a latest results file for easy access
         latest_file_path = RESULTS_DIR / "latest_batch_results.json"
         try:
-            with open(latest_file_path, 'w', encoding='utf-8') as f:
-                json.dump(batch_results, f, indent=2, ensure_ascii=False)
+            with open(latest_file_path, 'wb') as f:
+                f.write(payload)
         except Exception as e:
             print(f"Warning: Failed to save latest results file: {e}")
         
@@ -285,8 +335,8 @@ def get_batch_results():
                 status_code=404
             )
         
-        with open(latest_file_path, 'r', encoding='utf-8') as f:
-            results = json.load(f)
+        with open(latest_file_path, 'rb') as f:
+            results = orjson.loads(f.read())
         
         return JSONResponse(content=results)
         
@@ -305,10 +355,14 @@ def get_batch_history():
     try:
         batch_files = []
         
-        for file_path in RESULTS_DIR.glob("batch_results_*.json"):
+        # Older submissions were stored as plain .json, newer ones as .json.gz
+        for file_path in RESULTS_DIR.glob("batch_results_*.json*"):
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                with open(file_path, 'rb') as f:
+                    raw = f.read()
+                if file_path.suffix == '.gz':
+                    raw = gzip.decompress(raw)
+                data = orjson.loads(raw)
                 
                 batch_files.append({
                     "filename": file_path.name,
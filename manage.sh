@@ -17,7 +17,7 @@ function show_usage() {
     echo -e "${YELLOW}🚀 Usage:"
     echo -e "  chmod +x ./manage.sh         ${NC}# Make script executable"
     echo -e "  sudo ./manage.sh setup       ${NC}# Install dependencies & create venv"
-    echo -e "  sudo ./manage.sh run <dir>   ${NC}# Run OCR detection on directory"
+    echo -e "  sudo ./manage.sh run <dir>   ${NC}# Run OCR detection on directory (extra args go to app/main.py)"
     echo -e "  sudo ./manage.sh dashboard   ${NC}# Launch interactive dashboard"
     exit 1
 }
@@ -146,7 +146,7 @@ function run_ocr() {
 
     echo -e "${GREEN}📂 Running OCR on directory: $2${NC}"
     mkdir -p "$RUN_OUTPUT_DIR"
-    python3 app/main.py "$2" "$RUN_OUTPUT_DIR"
+    python3 app/main.py "$2" "$RUN_OUTPUT_DIR" "${@:3}"
     echo -e "${GREEN}✅ OCR completed. Output saved to ${RUN_OUTPUT_DIR}/.${NC}"
 }
 